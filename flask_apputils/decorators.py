@@ -7,8 +7,10 @@
 """
 
 from functools import wraps
-from flask import request, redirect, Response, render_template, jsonify
-from .helpers import json_value
+from tempfile import SpooledTemporaryFile
+from flask import request, redirect, Response, render_template, jsonify, abort
+from .helpers import json_value, parse_fields, to_msgpack, Paginator
+from .mimes import get_mimes, match_magic, MAGIC_SIZE
 
 __all__ = (
     'after_this_request',
@@ -16,7 +18,8 @@ __all__ = (
     'ssl_required',
     'with_request_body',
     'with_request_params',
-    'with_template'
+    'with_template',
+    'with_uploads'
 )
 
 
@@ -30,12 +33,23 @@ def after_this_request(f):
     return f
 
 
+_template_names = {}
+
+
+def _template_name(endpoint):
+    """Return the template name for the endpoint, caching the result"""
+    name = _template_names.get(endpoint)
+    if name is None:
+        name = _template_names[endpoint] = endpoint.replace('.', '/') + '.html'
+    return name
+
+
 def with_template(template=None, render_func=render_template):
     """Render a template using the `dict` result of the function as context.
 
     The function result is returned as is when not a `dict`.
     If not template name is given, a formatted endpoint name is used by
-    replacing '.' with the path separator
+    replacing '.' with the path separator. The resolved name is cached per endpoint.
 
     See: example_
 
@@ -47,7 +61,7 @@ def with_template(template=None, render_func=render_template):
         def wrapper(*args, **kwargs):
             template_name = template
             if template_name is None:
-                template_name = request.endpoint.replace('.', '/') + '.html'
+                template_name = _template_name(request.endpoint)
             ctx = f(*args, **kwargs)
             if ctx is None:
                 ctx = {}
@@ -105,6 +119,155 @@ def with_request_body(f):
     return wrapper
 
 
+def with_uploads(extensions=None, max_size=None, max_memory=1024 * 500, hash_name=None):
+    """Stream uploaded files of a multipart request into spooled temporary files.
+
+    Files are kept in memory up to `max_memory` bytes and rolled over to disk after.
+    The request is aborted while streaming with 413 when larger than `max_size` or the
+    `MAX_CONTENT_LENGTH` of the app, and with 415 when a file extension is not in `extensions`,
+    its declared content type does not match the extension in :mod:`mimes` or its first bytes
+    do not match the magic number of the extension. Files declared as 'application/octet-stream'
+    are only checked by their magic number. File inputs left empty are not checked.
+
+    The hex digest of each file is set as `hash` on the files in `request.files` when `hash_name`
+    is given, e.g. 'sha256'.
+
+    Files can only be streamed when the form was not loaded before, e.g. by :func:`with_request_body`.
+    Use the `uploads` option of :class:`APIBlueprint` routes for this. Otherwise the same checks are
+    applied to the files already parsed in `request.files`.
+
+    :param extensions: the allowed file extensions
+    :param max_size: the maximum size of the request body in bytes
+    :param max_memory: the maximum size of a file to keep in memory in bytes
+    :param hash_name: the name of the :mod:`hashlib` hash to compute for files
+    """
+    options = dict(extensions=extensions, max_size=max_size, max_memory=max_memory, hash_name=hash_name)
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(*args, **kwargs):
+            _parse_uploads(options)
+            return f(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+_UPLOADS_KEY = 'flask_apputils.uploads'
+
+
+def _parse_uploads(options):
+    from werkzeug.formparser import FormDataParser
+
+    if request.mimetype != 'multipart/form-data' or request.environ.get(_UPLOADS_KEY):
+        return
+    request.environ[_UPLOADS_KEY] = True
+
+    max_size = options['max_size']
+    if max_size is not None and (request.content_length or 0) > max_size:
+        abort(413)
+
+    if 'form' in request.__dict__:
+        _check_uploads(request.files, options)
+        return
+
+    limits = [n for n in (max_size, request.max_content_length) if n is not None]
+
+    def stream_factory(total_content_length, content_type, filename=None, content_length=None):
+        if not filename:
+            return SpooledTemporaryFile(options['max_memory'])
+        return _UploadStream(filename, content_type, **options)
+
+    parser = FormDataParser(stream_factory, request.charset, request.encoding_errors,
+                            max_form_memory_size=request.max_form_memory_size,
+                            max_content_length=min(limits) if limits else None,
+                            cls=request.parameter_storage_class)
+    stream, form, files = parser.parse_from_environ(request.environ)
+
+    for key, storage in files.items(multi=True):
+        if isinstance(storage.stream, _UploadStream):
+            storage.stream.verify()
+            if storage.stream.hash is not None:
+                storage.hash = storage.stream.hash.hexdigest()
+
+    request.__dict__.update(stream=stream, form=form, files=files)
+
+
+def _check_uploads(files, options):
+    """Apply the checks of :func:`with_uploads` to files parsed by the default form parser"""
+    for key, storage in files.items(multi=True):
+        if not storage.filename:
+            continue
+        extension = _check_file_type(storage.filename, storage.content_type, options['extensions'])
+        stream = storage.stream
+        stream.seek(0, 2)
+        if options['max_size'] is not None and stream.tell() > options['max_size']:
+            abort(413)
+        stream.seek(0)
+        if not match_magic(extension, stream.read(MAGIC_SIZE)):
+            abort(415)
+        if options['hash_name']:
+            import hashlib
+
+            stream.seek(0)
+            digest = hashlib.new(options['hash_name'])
+            for chunk in iter(lambda: stream.read(1024 * 64), b''):
+                digest.update(chunk)
+            storage.hash = digest.hexdigest()
+        stream.seek(0)
+
+
+def _check_file_type(filename, content_type, extensions):
+    """Return the extension of the file, aborting with 415 if not allowed or not of the declared type"""
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extensions is not None and extension not in extensions:
+        abort(415)
+    mimes = get_mimes(extension)
+    mimetype = content_type.split(';')[0].strip().lower() if content_type else None
+    if mimes and mimetype and mimetype != 'application/octet-stream' and mimetype not in mimes:
+        abort(415)
+    return extension
+
+
+class _UploadStream(object):
+    def __init__(self, filename, content_type, extensions, max_size, max_memory, hash_name):
+        self.extension = _check_file_type(filename, content_type, extensions)
+
+        self.file = SpooledTemporaryFile(max_memory)
+        self.max_size = max_size
+        self.size = 0
+        self.head = b''
+        self.hash = None
+        if hash_name:
+            import hashlib
+            self.hash = hashlib.new(hash_name)
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            abort(413)
+        if self.head is not None:
+            self.head += data[:MAGIC_SIZE]
+            if len(self.head) >= MAGIC_SIZE:
+                self.verify()
+        if self.hash is not None:
+            self.hash.update(data)
+        self.file.write(data)
+
+    def verify(self):
+        if self.head is not None:
+            if not match_magic(self.extension, self.head):
+                abort(415)
+            self.head = None
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __iter__(self):
+        return iter(self.file)
+
+
 def ssl_required(f):
     """Force requests to be secured with SSL. Must set the `SSL` config parameter to `True`
 
@@ -125,7 +288,7 @@ def ssl_required(f):
     return wrapper
 
 
-def as_json(f):
+def as_json(f=None, fields=False):
     """Return result as a JSON response.
 
     Responses of type :class:`flask.wrappers.Response` are returned as is.
@@ -133,8 +296,19 @@ def as_json(f):
     All other response types are serialized to JSON and returned
     in an object with key `result` such as: {'result': True}
 
+    With `fields` enabled, the `fields` query parameter selects the fields to serialize,
+    e.g. `@as_json(fields=True)`. See :func:`parse_fields`.
+
+    Responses of type :class:`Paginator` return a single page as `result` with the cursor of the
+    next page as `next`, which is also linked in the `Link` header.
+
+    Responses are encoded as MessagePack instead when preferred by the `Accept` header.
+
     :param f: function
+    :param fields: whether to apply the `fields` query parameter
     """
+    if f is None:
+        return lambda f: as_json(f, fields)
 
     @wraps(f)
     def wrapper(*args, **kwargs):
@@ -143,11 +317,45 @@ def as_json(f):
             raise Exception("Cannot serialize None to JSON")
         if isinstance(response, Response):
             return response
+        projection = None
+        if fields:
+            try:
+                projection = parse_fields(request.args.get('fields'))
+            except ValueError:
+                abort(400)
+        if isinstance(response, Paginator):
+            return _json_page(response, projection)
         if not callable(response):
-            response = json_value(response)
+            response = json_value(response, projection)
         if isinstance(response, dict):
-            return jsonify(**response)
+            return _encode(response)
         else:
-            return jsonify(result=response)
+            return _encode(dict(result=response))
 
     return wrapper
+
+
+_MSGPACK_MIMETYPE = 'application/x-msgpack'
+
+
+def _encode(data):
+    mimetype = request.accept_mimetypes.best_match(['application/json', _MSGPACK_MIMETYPE])
+    if mimetype == _MSGPACK_MIMETYPE:
+        response = Response(to_msgpack(data), mimetype=_MSGPACK_MIMETYPE)
+    else:
+        response = jsonify(**data)
+    response.vary.add('Accept')
+    return response
+
+
+def _json_page(paginator, fields):
+    from werkzeug.urls import url_encode
+
+    items, cursor = paginator.page(request.args)
+    response = _encode(dict(result=json_value(items, fields), next=cursor))
+    if cursor:
+        args = request.args.to_dict()
+        args.pop('offset', None)
+        args['cursor'] = cursor
+        response.headers['Link'] = '<%s?%s>; rel="next"' % (request.base_url, url_encode(args))
+    return response
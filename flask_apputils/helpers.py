@@ -4,49 +4,267 @@
     ~~~~~~~~~~~~~~~~~~~~~~
 """
 
+import json
+import struct
+from base64 import urlsafe_b64encode, urlsafe_b64decode
 from datetime import datetime, date, time
+from itertools import dropwhile, islice
 from logging import LoggerAdapter
 from flask.globals import current_app
-from flask import url_for, get_flashed_messages
+from flask import url_for, get_flashed_messages, abort
+from jinja2 import nodes
+from jinja2.ext import Extension
 from jinja2.utils import Markup
 
 __all__ = [
+    'FragmentCacheExtension',
     'get_flash',
     'get_logger',
     'image_tag',
     'json_value',
     'link_to',
+    'Paginator',
     'parse_datetime',
+    'parse_fields',
     'parse_date',
     'parse_time',
     'script_tag',
     'static_file',
-    'style_tag'
+    'style_tag',
+    'to_msgpack'
 ]
 
 
-def json_value(value):
+def json_value(value, fields=None):
     """Convert a object to a JSON primitive value
 
     To support any arbitrary object, implement `to_json` method on the object
     which returns the desired JSON primitive value
 
+    Only the keys of `fields` are converted for objects when given. The values of `fields`
+    are applied to the corresponding nested values or `None` to convert them in full.
+    See :func:`parse_fields`.
+
     :param value: the value to convert to a JSON primitive
+    :param fields: the projection to apply
     """
     if value is None or isinstance(value, (int, float, str, bool)):
         return value
     elif isinstance(value, (list, set, tuple)):
-        return [json_value(v) for v in value]
+        return [json_value(v, fields) for v in value]
     elif isinstance(value, dict):
-        return {k: json_value(value[k]) for k in value}
+        if fields is None:
+            return {k: json_value(value[k]) for k in value}
+        return {k: json_value(value[k], fields[k]) for k in fields if k in value}
     elif isinstance(value, (datetime, date, time)):
         return value.isoformat()
     elif hasattr(value, 'to_json') and callable(getattr(value, 'to_json')):
-        return json_value(value.to_json())
+        return json_value(value.to_json(), fields)
     else:
         return str(value)
 
 
+_projections = {}
+_MAX_PROJECTIONS = 1024
+
+
+def parse_fields(fields=None):
+    """Parse comma separated field paths into a projection for :func:`json_value`.
+
+    Nested fields are given as dotted paths, e.g. 'id,author.name' gives {'id': None, 'author': {'name': None}}.
+    Returns `None` when no fields are given. Parsed projections are cached.
+    Raises :class:`ValueError` for malformed paths such as 'author..name'.
+
+    :param fields: the fields string
+    """
+    if not fields:
+        return None
+    plan = _projections.get(fields)
+    if plan is None:
+        plan = {}
+        for path in fields.split(','):
+            parts = [p.strip() for p in path.split('.')]
+            if not all(parts):
+                raise ValueError("Invalid field path: %r" % path)
+            node = plan
+            for part in parts[:-1]:
+                if part in node and node[part] is None:
+                    break
+                node = node.setdefault(part, {})
+            else:
+                node[parts[-1]] = None
+        if len(_projections) >= _MAX_PROJECTIONS:
+            _projections.clear()
+        _projections[fields] = plan
+    return plan
+
+
+class Paginator(object):
+    """Paginate a lazy query or iterable returned by a handler wrapped with :func:`as_json`.
+
+    Only the requested page is fetched, by slicing lists, tuples and queries with a `slice` method
+    (e.g. LIMIT/OFFSET), or by iterating other iterables up to the end of the page.
+    The page is selected with the `limit` and `offset` query parameters or with the opaque `cursor`
+    returned as `next` with each page.
+
+    When `key` is given, keyset cursors holding the key of the last item of the page are used instead
+    of offsets. The `seek` function receives the items and the key value and must return the items
+    after that value, e.g. `lambda q, v: q.filter(User.id > v)`. Without it, iterables are skipped
+    until the key is greater than the value. Keys must be strings or numbers.
+
+    ..code: python
+
+        @route('/users')
+        @as_json
+        def users():
+            return Paginator(User.query.order_by(User.id), key='id', seek=lambda q, v: q.filter(User.id > v))
+
+    :param items: the query or iterable to paginate
+    :param key: an attribute name or function returning the ordered key of an item
+    :param seek: function to filter the items after a key value
+    :param limit: the default number of items per page
+    :param max_limit: the maximum number of items per page
+    """
+
+    def __init__(self, items, key=None, seek=None, limit=20, max_limit=100):
+        self.items = items
+        self.key = key
+        self.seek = seek
+        self.limit = limit
+        self.max_limit = max_limit
+
+    def get_key(self, item):
+        """Return the key of the item as a JSON primitive value"""
+        if callable(self.key):
+            value = self.key(item)
+        elif isinstance(item, dict):
+            value = item[self.key]
+        else:
+            value = getattr(item, self.key)
+        return json_value(value)
+
+    def page(self, args):
+        """Return the items of the page selected by the request `args` and the cursor of the next page
+
+        :param args: the request query parameters
+        """
+        try:
+            limit = max(1, min(int(args.get('limit', self.limit)), self.max_limit))
+            offset = max(0, int(args.get('offset', 0)))
+            after = None
+            cursor = args.get('cursor')
+            if cursor:
+                mode, value = json.loads(urlsafe_b64decode(str(cursor)))
+                if mode == 'k' and self.key is not None and _is_key(value):
+                    after = value
+                elif mode == 'o':
+                    offset = max(0, int(value))
+                else:
+                    raise ValueError(cursor)
+        except (TypeError, ValueError):
+            abort(400)
+
+        items = self.items
+        if after is not None:
+            offset = 0
+            if self.seek is not None:
+                items = self.seek(items, after)
+            else:
+                items = dropwhile(lambda v: self.get_key(v) <= after, items)
+
+        if isinstance(items, (list, tuple)) or hasattr(items, 'slice'):
+            page = list(items[offset:offset + limit + 1])
+        else:
+            page = list(islice(items, offset, offset + limit + 1))
+
+        cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            if self.key is not None:
+                key = self.get_key(page[-1])
+                if not _is_key(key):
+                    raise ValueError("Cannot paginate with the key %r" % key)
+                cursor = ['k', key]
+            else:
+                cursor = ['o', offset + limit]
+            cursor = urlsafe_b64encode(json.dumps(cursor))
+        return page, cursor
+
+
+def _is_key(value):
+    return isinstance(value, (basestring, int, long, float)) and not isinstance(value, bool)
+
+
+def to_msgpack(value):
+    """Encode a JSON primitive value as MessagePack
+
+    Other values should be converted with :func:`json_value` first.
+
+    :param value: the JSON primitive value
+    """
+    chunks = []
+    _pack(value, chunks)
+    return b''.join(chunks)
+
+
+def _pack(value, chunks):
+    if value is None:
+        chunks.append(b'\xc0')
+    elif value is True:
+        chunks.append(b'\xc3')
+    elif value is False:
+        chunks.append(b'\xc2')
+    elif isinstance(value, (int, long)):
+        if 0 <= value < 0x80:
+            chunks.append(struct.pack('B', value))
+        elif -0x20 <= value < 0:
+            chunks.append(struct.pack('b', value))
+        elif 0 <= value <= 0xffffffffffffffff:
+            for fmt, code in (('>B', 0xcc), ('>H', 0xcd), ('>I', 0xce), ('>Q', 0xcf)):
+                if value < 1 << (struct.calcsize(fmt) * 8):
+                    chunks.append(struct.pack('B', code) + struct.pack(fmt, value))
+                    break
+        elif -0x8000000000000000 <= value < 0:
+            for fmt, code in (('>b', 0xd0), ('>h', 0xd1), ('>i', 0xd2), ('>q', 0xd3)):
+                if value >= -(1 << (struct.calcsize(fmt) * 8 - 1)):
+                    chunks.append(struct.pack('B', code) + struct.pack(fmt, value))
+                    break
+        else:
+            raise ValueError("Integer out of range for MessagePack: %s" % value)
+    elif isinstance(value, float):
+        chunks.append(b'\xcb' + struct.pack('>d', value))
+    elif isinstance(value, basestring):
+        if isinstance(value, unicode):
+            value = value.encode('utf-8')
+        size = len(value)
+        if size < 0x20:
+            chunks.append(struct.pack('B', 0xa0 | size))
+        else:
+            chunks.append(_pack_size(size, 0xd9, 0xda, 0xdb))
+        chunks.append(value)
+    elif isinstance(value, (list, tuple)):
+        size = len(value)
+        chunks.append(struct.pack('B', 0x90 | size) if size < 0x10 else _pack_size(size, None, 0xdc, 0xdd))
+        for v in value:
+            _pack(v, chunks)
+    elif isinstance(value, dict):
+        size = len(value)
+        chunks.append(struct.pack('B', 0x80 | size) if size < 0x10 else _pack_size(size, None, 0xde, 0xdf))
+        for k, v in value.items():
+            _pack(k, chunks)
+            _pack(v, chunks)
+    else:
+        raise TypeError("Cannot encode %r as MessagePack" % value)
+
+
+def _pack_size(size, code8, code16, code32):
+    if code8 is not None and size < 0x100:
+        return struct.pack('>BB', code8, size)
+    elif size < 0x10000:
+        return struct.pack('>BH', code16, size)
+    return struct.pack('>BI', code32, size)
+
+
 def static_file(filename):
     """Return a link to a file from the current app `STATIC_FOLDER`"""
     return url_for(current_app.static_folder, filename=filename, _external=True)
@@ -178,3 +396,81 @@ def parse_time(value):
         except:
             pass
     return None
+
+
+class FragmentCacheExtension(Extension):
+    """Jinja extension to cache expensive template fragments by key
+
+    The cached output is stored in `environment.fragment_cache` which defaults to a
+    :class:`werkzeug.contrib.cache.SimpleCache` when available, or a simple in-memory cache.
+    Any werkzeug cache may be assigned instead. Omitting the timeout uses the default timeout of the cache.
+
+    Enable it with the `TEMPLATE_FRAGMENT_CACHE` config parameter of :class:`TemplateBlueprint`
+    or by adding it to the `extensions` of `app.jinja_options`.
+
+    ..code: html
+
+        {% cache 'sidebar/' ~ user.id, 300 %}
+            ...
+        {% endcache %}
+    """
+    tags = set(['cache'])
+
+    def __init__(self, environment):
+        try:
+            from werkzeug.contrib.cache import SimpleCache
+        except ImportError:
+            SimpleCache = _SimpleCache
+
+        super(FragmentCacheExtension, self).__init__(environment)
+        environment.extend(fragment_cache_prefix='fragment/', fragment_cache=SimpleCache())
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache_support', args), [], [], body).set_lineno(lineno)
+
+    def _cache_support(self, key, timeout, caller):
+        key = self.environment.fragment_cache_prefix + key
+        cache = self.environment.fragment_cache
+        rv = cache.get(key)
+        if rv is None:
+            rv = caller()
+            cache.set(key, rv, timeout)
+        return rv
+
+
+class _SimpleCache(object):
+    """In-memory cache with the `get` and `set` interface of the werkzeug caches"""
+
+    def __init__(self, threshold=500, default_timeout=300):
+        from time import time as now
+
+        self._cache = {}
+        self._now = now
+        self.threshold = threshold
+        self.default_timeout = default_timeout
+
+    def get(self, key):
+        item = self._cache.get(key)
+        if item is not None and item[0] > self._now():
+            return item[1]
+        return None
+
+    def set(self, key, value, timeout=None):
+        if len(self._cache) >= self.threshold:
+            now = self._now()
+            for k, item in list(self._cache.items()):
+                if item[0] <= now:
+                    del self._cache[k]
+            if len(self._cache) >= self.threshold:
+                self._cache.clear()
+        if timeout is None:
+            timeout = self.default_timeout
+        self._cache[key] = (self._now() + timeout, value)
+        return True
@@ -4,21 +4,174 @@
     ~~~~~~~~~~~~~~~~~~~~~~~~~~
 """
 
+from werkzeug.utils import cached_property
+from flask.wrappers import Request
+
+__all__ = (
+    'CachedRequest',
+    'MethodRewriteMiddleware',
+    'MiddlewareStack',
+    'RequestCache',
+    'get_request_cache'
+)
+
+_CACHE_KEY = 'flask_apputils.request_cache'
+
+
+class RequestCache(object):
+    """Query string, cookies and common headers of a request, each parsed at most once.
+
+    Values are parsed with the settings (charset, storage classes) of the given request,
+    or of :class:`flask.wrappers.Request` by default, and cached per settings. The cache is
+    shared through the WSGI environ by :class:`MiddlewareStack`, the middlewares and
+    :class:`CachedRequest`. It holds no reference to the environ.
+    """
+
+    def __init__(self):
+        self._values = {}
+
+    def args(self, environ, request=None):
+        """Return the parsed query string
+
+        :param environ: the WSGI environ
+        :param request: the request whose settings are used for parsing
+        """
+        from werkzeug.urls import url_decode
+        from werkzeug.wsgi import get_query_string
+
+        request = request or _default_request
+        key = ('args', request.url_charset, request.encoding_errors, request.parameter_storage_class)
+        value = self._values.get(key)
+        if value is None:
+            value = self._values[key] = url_decode(get_query_string(environ), key[1], errors=key[2], cls=key[3])
+        return value
+
+    def cookies(self, environ, request=None):
+        """Return the parsed cookies
+
+        :param environ: the WSGI environ
+        :param request: the request whose settings are used for parsing
+        """
+        from werkzeug.http import parse_cookie
+
+        request = request or _default_request
+        key = ('cookies', request.charset, request.encoding_errors, request.dict_storage_class)
+        value = self._values.get(key)
+        if value is None:
+            value = self._values[key] = parse_cookie(environ, key[1], key[2], cls=key[3])
+        return value
+
+    def accept_mimetypes(self, environ):
+        """Return the parsed `Accept` header
+
+        :param environ: the WSGI environ
+        """
+        from werkzeug.http import parse_accept_header
+        from werkzeug.datastructures import MIMEAccept
+
+        value = self._values.get('accept_mimetypes')
+        if value is None:
+            value = self._values['accept_mimetypes'] = parse_accept_header(environ.get('HTTP_ACCEPT'), MIMEAccept)
+        return value
+
+
+_default_request = Request({}, populate_request=False)
+
+
+def get_request_cache(environ):
+    """Return the :class:`RequestCache` of the WSGI environ, creating it if missing"""
+    cache = environ.get(_CACHE_KEY)
+    if cache is None:
+        cache = environ[_CACHE_KEY] = RequestCache()
+    return cache
+
+
+class CachedRequest(Request):
+    """Request which reuses the values parsed by the middlewares in :class:`RequestCache`
+
+    ..code: python
+
+        app.request_class = CachedRequest
+    """
+
+    @cached_property
+    def args(self):
+        return get_request_cache(self.environ).args(self.environ, self)
+
+    @cached_property
+    def cookies(self):
+        return get_request_cache(self.environ).cookies(self.environ, self)
+
+    @cached_property
+    def accept_mimetypes(self):
+        return get_request_cache(self.environ).accept_mimetypes(self.environ)
+
+
+class _RequestProcessors(object):
+    def __init__(self, app, processors):
+        self.app = app
+        self.processors = processors
+
+    def __call__(self, environ, start_response):
+        cache = get_request_cache(environ)
+        for process in self.processors:
+            process(environ, cache)
+        return self.app(environ, start_response)
+
+
+class MiddlewareStack(_RequestProcessors):
+    """Compose middlewares into a single WSGI callable.
+
+    Each middleware is created by calling it with the application it wraps, the first
+    middleware being the outermost. Consecutive middlewares which implement
+    `process_request(environ, cache)` are called in a loop without nesting the application,
+    receiving the shared :class:`RequestCache`. Other middlewares wrap the application as usual.
+
+    ..code: python
+
+        app.wsgi_app = MiddlewareStack(app.wsgi_app, [MethodRewriteMiddleware])
+
+    :param app: the WSGI application
+    :param middlewares: list of middleware classes or factories in order
+    """
+
+    def __init__(self, app, middlewares):
+        processors = []
+        for factory in reversed(middlewares):
+            # support `functools.partial` factories
+            if hasattr(getattr(factory, 'func', factory), 'process_request'):
+                processors.insert(0, factory(app).process_request)
+            else:
+                if processors:
+                    app = _RequestProcessors(app, processors)
+                    processors = []
+                app = factory(app)
+        super(MiddlewareStack, self).__init__(app, processors)
+
 
 class MethodRewriteMiddleware(object):
+    """Rewrite the method of POST requests from the `X-HTTP-Method-Override` header
+    or the `method_name` query parameter.
+    """
+    methods = ('POST', 'PUT', 'DELETE')
+
     def __init__(self, app, method_name='_method'):
         self.app = app
         self.name = method_name
 
     def __call__(self, environ, start_response):
-        from werkzeug.urls import url_decode
+        self.process_request(environ, get_request_cache(environ))
+        return self.app(environ, start_response)
 
-        if self.name in environ.get('QUERY_STRING', ''):
-            args = url_decode(environ['QUERY_STRING'])
-            method = args.get(self.name).upper()
-            req_method = environ['REQUEST_METHOD']
-            if req_method == 'POST' and method in ['POST', 'PUT', 'DELETE']:
-                method = method.encode('ascii', 'replace')
-                environ['REQUEST_METHOD'] = method
+    def process_request(self, environ, cache):
+        if environ['REQUEST_METHOD'] != 'POST':
+            return
 
-        return self.app(environ, start_response)
+        method = environ.get('HTTP_X_HTTP_METHOD_OVERRIDE')
+        if not method and self.name in environ.get('QUERY_STRING', ''):
+            method = cache.args(environ).get(self.name)
+
+        if method:
+            method = method.upper()
+            if method in self.methods:
+                environ['REQUEST_METHOD'] = method.encode('ascii', 'replace')
@@ -7,7 +7,7 @@
     based on their extensions.
 """
 
-__all__ = ['get_mimes', 'get_extensions']
+__all__ = ['get_mimes', 'get_extensions', 'match_magic']
 
 _mime_types = {
     'hqx': ['application/mac-binhex40'],
@@ -41,7 +41,7 @@ _mime_types = {
     'dxr': ['application/x-director'],
     'dvi': ['application/x-dvi'],
     'gtar': ['application/x-gtar'],
-    'gz': ['application/x-gzip'],
+    'gz': ['application/x-gzip', 'application/gzip'],
     'php': ['application/x-httpd-php'],
     'php4': ['application/x-httpd-php'],
     'php3': ['application/x-httpd-php'],
@@ -51,13 +51,13 @@ _mime_types = {
     'swf': ['application/x-shockwave-flash'],
     'sit': ['application/x-stuffit'],
     'tar': ['application/x-tar'],
-    'tgz': ['application/x-tar'],
+    'tgz': ['application/x-tar', 'application/x-gzip', 'application/gzip', 'application/x-compressed-tar'],
     'json': ['application/json'],
     'xhtml': ['application/xhtml+xml'],
     'xht': ['application/xhtml+xml'],
     'zip': ['application/x-zip', 'application/zip', 'application/x-zip-compressed'],
-    'mid': ['audio/midi'],
-    'midi': ['audio/midi'],
+    'mid': ['audio/midi', 'audio/x-midi'],
+    'midi': ['audio/midi', 'audio/x-midi'],
     'mpga': ['audio/mpeg'],
     'mp2': ['audio/mpeg'],
     'mp3': ['audio/mpeg', 'audio/mpg'],
@@ -69,8 +69,8 @@ _mime_types = {
     'rpm': ['audio/x-pn-realaudio-plugin'],
     'ra': ['audio/x-realaudio'],
     'rv': ['video/vnd.rn-realvideo'],
-    'wav': ['audio/x-wav'],
-    'bmp': ['image/bmp'],
+    'wav': ['audio/x-wav', 'audio/wav', 'audio/wave', 'audio/vnd.wave'],
+    'bmp': ['image/bmp', 'image/x-bmp', 'image/x-ms-bmp'],
     'gif': ['image/gif'],
     'jpeg': ['image/jpeg', 'image/pjpeg'],
     'jpg': ['image/jpeg', 'image/pjpeg'],
@@ -86,7 +86,7 @@ _mime_types = {
     'text': ['text/plain'],
     'log': ['text/plain', 'text/x-log'],
     'rtx': ['text/richtext'],
-    'rtf': ['text/rtf'],
+    'rtf': ['text/rtf', 'application/rtf'],
     'xml': ['text/xml'],
     'xsl': ['text/xml'],
     'mpeg': ['video/mpeg'],
@@ -94,7 +94,7 @@ _mime_types = {
     'mpe': ['video/mpeg'],
     'qt': ['video/quicktime'],
     'mov': ['video/quicktime'],
-    'avi': ['video/x-msvideo'],
+    'avi': ['video/x-msvideo', 'video/avi', 'video/msvideo'],
     'movie': ['video/x-sgi-movie'],
     'doc': ['application/msword'],
     'docx': ['application/vnd.openxmlformats-officedocument.wordprocessingml.document'],
@@ -104,6 +104,52 @@ _mime_types = {
     'eml': ['message/rfc822']
 }
 
+_ole = [b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1']
+_zip = [b'PK\x03\x04', b'PK\x05\x06']
+_gzip = [b'\x1f\x8b']
+_jpeg = [b'\xff\xd8\xff']
+_tiff = [b'II*\x00', b'MM\x00*']
+_postscript = [b'%!']
+_mz = [b'MZ']
+
+_magic_numbers = {
+    'pdf': [b'%PDF-'],
+    'ai': [b'%PDF-', b'%!'],
+    'eps': _postscript,
+    'ps': _postscript,
+    'psd': [b'8BPS'],
+    'xls': _ole,
+    'ppt': _ole,
+    'doc': _ole,
+    'word': _ole,
+    'docx': _zip,
+    'xlsx': _zip,
+    'zip': _zip,
+    'gz': _gzip,
+    'tgz': _gzip,
+    'exe': _mz,
+    'dll': _mz,
+    'swf': [b'FWS', b'CWS', b'ZWS'],
+    'mid': [b'MThd'],
+    'midi': [b'MThd'],
+    'wav': [b'RIFF'],
+    'avi': [b'RIFF'],
+    'aif': [b'FORM'],
+    'aiff': [b'FORM'],
+    'aifc': [b'FORM'],
+    'bmp': [b'BM'],
+    'gif': [b'GIF87a', b'GIF89a'],
+    'jpeg': _jpeg,
+    'jpg': _jpeg,
+    'jpe': _jpeg,
+    'png': [b'\x89PNG\r\n\x1a\n'],
+    'tiff': _tiff,
+    'tif': _tiff,
+    'rtf': [b'{\\rtf'],
+}
+
+MAGIC_SIZE = max(len(m) for ms in _magic_numbers.values() for m in ms)
+
 
 def get_mimes(extension=None):
     """Returns the mime_types for the given extension"""
@@ -117,3 +163,20 @@ def get_extensions(mime_type=None):
         if mime_type in _mime_types[ext]:
             exts.append(ext)
     return exts
+
+
+def match_magic(extension, data):
+    """Returns whether the leading bytes of the content match the extension.
+
+    Extensions without known magic numbers always match.
+
+    :param extension: the file extension
+    :param data: the first bytes of the content, at least `MAGIC_SIZE` when available
+    """
+    magic = _magic_numbers.get(extension)
+    if not magic:
+        return True
+    for m in magic:
+        if data.startswith(m):
+            return True
+    return False
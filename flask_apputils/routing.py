@@ -8,7 +8,8 @@
 
 from werkzeug.utils import import_string, cached_property
 from flask.blueprints import Blueprint
-from .decorators import as_json, with_request_body, with_template
+from .decorators import as_json, with_request_body, with_template, with_uploads, _template_name
+from .helpers import FragmentCacheExtension
 
 __all__ = (
     'APIBlueprint',
@@ -78,10 +79,29 @@ def get_router(blueprint, import_prefix=None, filters=None):
 class APIBlueprint(Blueprint):
     """
     Blueprint which inject request body into handler and return responses as JSON.
+
+    The `fields` query parameter selects the fields of the responses when the `fields` argument
+    of the blueprint or the `fields` route option is `True`. See :func:`as_json`.
+
+    Uploaded files are streamed and checked before the request body is read when the `uploads`
+    route option gives the keyword arguments of :func:`with_uploads`, such as:
+
+    ..code: python
+
+        route('/avatar', 'upload_avatar', methods=['POST'], uploads=dict(extensions=['png'], max_size=2 ** 20))
     """
 
+    def __init__(self, *args, **kwargs):
+        self.fields = kwargs.pop('fields', False)
+        super(APIBlueprint, self).__init__(*args, **kwargs)
+
     def add_url_rule(self, rule, endpoint=None, view_func=None, **options):
-        view_func = as_json(with_request_body(view_func))
+        uploads = options.pop('uploads', None)
+        fields = options.pop('fields', self.fields)
+        view_func = with_request_body(view_func)
+        if uploads is not None:
+            view_func = with_uploads(**uploads)(view_func)
+        view_func = as_json(view_func, fields=fields)
         return super(APIBlueprint, self).add_url_rule(rule, endpoint, view_func, **options)
 
 
@@ -89,8 +109,89 @@ class TemplateBlueprint(Blueprint):
     """Blueprint which loads and render templates with response data as context
 
     The template directory corresponds to the name of the blueprint in the `app.template_folder`
+
+    Call :meth:`init_app` at startup, once the app is configured and the blueprint registered,
+    to compile all the templates of the blueprint, i.e. those under its directory, unless the
+    `TEMPLATE_PRECOMPILE` config parameter is set to `False`. Set the `TEMPLATE_PRECOMPILE_ON_FIRST_REQUEST`
+    config parameter to `True` to call it before the first request instead.
+
+    Compiled templates may be persisted across restarts by setting the `TEMPLATE_BYTECODE_CACHE`
+    config parameter to a directory. Set the `TEMPLATE_FRAGMENT_CACHE` config parameter to `True`
+    to enable the :class:`FragmentCacheExtension` for caching expensive template blocks.
+
+    ..code: python
+
+        app.register_blueprint(web)
+        web.init_app(app)
     """
 
+    def __init__(self, *args, **kwargs):
+        super(TemplateBlueprint, self).__init__(*args, **kwargs)
+        self.template_endpoints = []
+
     def add_url_rule(self, rule, endpoint=None, view_func=None, **options):
+        self.template_endpoints.append(endpoint or view_func.__name__)
         view_func = with_template()(view_func)
         return super(TemplateBlueprint, self).add_url_rule(rule, endpoint, view_func, **options)
+
+    def register(self, app, options, first_registration=False):
+        super(TemplateBlueprint, self).register(app, options, first_registration)
+        if first_registration and app.config.get('TEMPLATE_PRECOMPILE_ON_FIRST_REQUEST'):
+            app.before_first_request(lambda: self.init_app(app))
+
+    def init_app(self, app):
+        """Configure the app jinja environment and precompile the templates of the blueprint.
+
+        Must be called after the app is configured since the jinja environment of the app is created.
+
+        :param app: the app the blueprint is registered on
+        """
+        initialized = app.extensions.setdefault('apputils.templates', set())
+        if self.name in initialized:
+            return
+        initialized.add(self.name)
+
+        env = app.jinja_env
+
+        if app.config.get('TEMPLATE_FRAGMENT_CACHE') and FragmentCacheExtension.identifier not in env.extensions:
+            env.add_extension(FragmentCacheExtension)
+
+        cache_dir = app.config.get('TEMPLATE_BYTECODE_CACHE')
+        if cache_dir and env.bytecode_cache is None:
+            from jinja2 import FileSystemBytecodeCache
+            env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+        if app.config.get('TEMPLATE_PRECOMPILE', True):
+            self.precompile(app)
+
+    def precompile(self, app):
+        """Load and compile the templates of the blueprint into the app template cache.
+
+        These are the templates under the directory of the blueprint, including layouts and partials,
+        and the templates of the blueprint endpoints. The jinja template cache (see the `cache_size`
+        of `app.jinja_options`, 400 by default) is enlarged to hold them if needed.
+
+        :param app: the app the blueprint is registered on
+        """
+        from jinja2 import TemplateNotFound
+        from jinja2.utils import LRUCache
+
+        env = app.jinja_env
+        names = set(_template_name(self.name + '.' + endpoint) for endpoint in self.template_endpoints)
+        try:
+            names.update(env.list_templates(filter_func=lambda name: name.startswith(self.name + '/')))
+        except TypeError:
+            # the loader cannot list its templates
+            pass
+
+        cache = env.cache
+        if isinstance(cache, LRUCache) and cache.capacity < len(cache) + len(names):
+            env.cache = LRUCache(cache.capacity + len(names))
+            for key, value in reversed(cache.items()):
+                env.cache[key] = value
+
+        for name in names:
+            try:
+                env.get_template(name)
+            except TemplateNotFound:
+                pass
@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+"""
+    Benchmarks for the decorators, serializer, routing and middlewares.
+
+    Reports throughput, latency percentiles and peak memory of each benchmark
+    and compares the throughput against a stored baseline. Throughput is the median
+    of several repeats. Peak memory is the memory traced while running the benchmark
+    when :mod:`tracemalloc` is available, otherwise the growth of the peak resident
+    size of a forked process running the benchmark.
+
+    ..code: bash
+
+        $ python benchmark.py --save        # store the baseline
+        $ python benchmark.py               # fail if slower than the baseline by more than 20%
+        $ python benchmark.py -t 0.1 json   # run benchmarks matching 'json' with a 10% threshold
+"""
+
+import gc
+import json
+import os
+import sys
+import argparse
+from datetime import datetime, date
+from timeit import default_timer
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from flask import Flask
+from werkzeug.test import create_environ
+from flask_apputils import helpers, mimes, validators
+from flask_apputils.middlewares import MethodRewriteMiddleware, MiddlewareStack
+from flask_apputils.routing import APIBlueprint, TemplateBlueprint, get_router
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+class Author(object):
+    def __init__(self, i):
+        self.i = i
+
+    def to_json(self):
+        return dict(id=self.i, name='Author %d' % self.i, email='author%d@example.com' % self.i,
+                    joined=date(2015, 1, 1 + self.i % 28), tags=['a', 'b', 'c'])
+
+
+PAYLOAD = [dict(id=i, title='Post %d' % i, score=i * 0.5, published=True,
+                created=datetime(2015, 1, 1, 12, i % 60), author=Author(i),
+                comments=[dict(id=j, text='Comment %d' % j) for j in range(5)])
+           for i in range(100)]
+FIELDS = helpers.parse_fields('id,title,author.name')
+ENCODED = helpers.json_value(PAYLOAD)
+
+
+def user():
+    return dict(name='John', age=32)
+
+
+def posts():
+    return PAYLOAD
+
+
+def home():
+    return 'Home Page'
+
+
+api = APIBlueprint('api', __name__, url_prefix='/api', fields=True)
+route = get_router(api, __name__)
+route('/user', 'user')
+route('/posts', 'posts')
+
+web = TemplateBlueprint('web', __name__)
+get_router(web, __name__)('/home', 'home')
+
+app = Flask(__name__)
+app.register_blueprint(api)
+app.register_blueprint(web)
+client = app.test_client()
+
+
+def _null_app(environ, start_response):
+    return environ
+
+
+_rewrite = MethodRewriteMiddleware(_null_app)
+_rewrite_environ = create_environ('/user?page=2&_method=put', method='POST')
+_stack = MiddlewareStack(_null_app, [MethodRewriteMiddleware, MethodRewriteMiddleware])
+_override_environ = create_environ('/user?page=2', method='POST', headers=[('X-HTTP-Method-Override', 'PUT')])
+
+
+def bench_rewrite_middleware():
+    environ = dict(_rewrite_environ)
+    _rewrite(environ, None)
+
+
+def bench_middleware_stack():
+    environ = dict(_override_environ)
+    _stack(environ, None)
+
+
+def bench_app_api_json():
+    client.get('/api/user')
+
+
+def bench_app_api_posts():
+    client.get('/api/posts')
+
+
+def bench_app_api_fields():
+    client.get('/api/posts?fields=id,title,author.name')
+
+
+def bench_app_api_msgpack():
+    client.get('/api/posts', headers=[('Accept', 'application/x-msgpack')])
+
+
+def bench_app_template():
+    client.get('/home')
+
+
+def bench_json_value():
+    helpers.json_value(PAYLOAD)
+
+
+def bench_json_value_fields():
+    helpers.json_value(PAYLOAD, FIELDS)
+
+
+def bench_parse_fields():
+    helpers._projections.clear()
+    helpers.parse_fields('id,title,author.name,author.email,comments')
+
+
+def bench_to_msgpack():
+    helpers.to_msgpack(ENCODED)
+
+
+def bench_json_dumps():
+    json.dumps(ENCODED)
+
+
+def bench_validators():
+    validators.email('john.doe@example.com')
+    validators.required('value')()
+    validators.regexp('2015-01-01', r'^\d{4}-\d{2}-\d{2}$')()
+
+
+def bench_parse_datetime():
+    helpers.parse_datetime('2015-01-01 12:30:00')
+    helpers.parse_date('20150101')
+    helpers.parse_time('123000')
+
+
+def bench_get_extensions():
+    mimes.get_extensions('image/png')
+    mimes.get_mimes('csv')
+
+
+def _percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def _max_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def peak_memory(func, iterations):
+    """Return the peak memory in bytes of calling `func` for the given iterations.
+
+    Uses :mod:`tracemalloc` when available, otherwise the growth of the peak resident size
+    of a forked process so that each benchmark is measured on its own.
+    """
+    if tracemalloc:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            for _ in range(iterations):
+                func()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    if resource is None or not hasattr(os, 'fork'):
+        return None
+
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_fd)
+        try:
+            start = _max_rss()
+            for _ in range(iterations):
+                func()
+            os.write(write_fd, str(_max_rss() - start).encode('ascii'))
+        finally:
+            os._exit(0)
+
+    os.close(write_fd)
+    with os.fdopen(read_fd) as f:
+        result = f.read()
+    os.waitpid(pid, 0)
+    return int(result) if result else None
+
+
+def run(func, iterations, warmup, repeat):
+    for _ in range(warmup):
+        func()
+
+    ops = []
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = default_timer()
+        for _ in range(iterations):
+            t = default_timer()
+            func()
+            timings.append(default_timer() - t)
+        ops.append(iterations / (default_timer() - start))
+
+    # measured separately to keep tracing overhead out of the timings
+    peak = peak_memory(func, min(iterations, 100))
+
+    ops.sort()
+    timings.sort()
+    return dict(ops=ops[len(ops) // 2],
+                p50=_percentile(timings, 0.5) * 1e6,
+                p95=_percentile(timings, 0.95) * 1e6,
+                p99=_percentile(timings, 0.99) * 1e6,
+                peak=peak)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().split('\n')[0])
+    parser.add_argument('patterns', nargs='*', help='run only benchmarks with names containing a pattern')
+    parser.add_argument('-n', '--iterations', type=int, default=2000)
+    parser.add_argument('-w', '--warmup', type=int, default=200)
+    parser.add_argument('-r', '--repeat', type=int, default=5,
+                        help='number of repeats to take the median throughput of (default: 5)')
+    parser.add_argument('-t', '--threshold', type=float, default=0.2,
+                        help='allowed throughput regression from the baseline (default: 0.2)')
+    parser.add_argument('-b', '--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true', help='store the results as the baseline')
+    args = parser.parse_args(argv)
+
+    benchmarks = sorted((name[6:], func) for name, func in globals().items() if name.startswith('bench_'))
+    if args.patterns:
+        benchmarks = [(name, func) for name, func in benchmarks if any(p in name for p in args.patterns)]
+
+    baseline = {}
+    if not args.save:
+        if not os.path.exists(args.baseline):
+            sys.stderr.write('No baseline found at %s. Run with --save to store one.\n' % args.baseline)
+            return 2
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    failed = []
+    stdout = sys.stdout
+    print('%-22s %12s %10s %10s %10s %10s %9s' % ('benchmark', 'ops/s', 'p50 us', 'p95 us', 'p99 us',
+                                                   'peak KiB', 'change'))
+    for name, func in benchmarks:
+        # silence handlers which log to stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            result = results[name] = run(func, args.iterations, args.warmup, args.repeat)
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+
+        change = ''
+        if name in baseline:
+            ratio = result['ops'] / baseline[name]['ops'] - 1
+            change = '%+.1f%%' % (ratio * 100)
+            if ratio < -args.threshold:
+                failed.append(name)
+                change += ' !'
+        elif not args.save:
+            change = 'new'
+        peak = '%.1f' % (result['peak'] / 1024.0) if result['peak'] is not None else '-'
+        print('%-22s %12.1f %10.1f %10.1f %10.1f %10s %9s' % (name, result['ops'], result['p50'], result['p95'],
+                                                               result['p99'], peak, change))
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print('Saved baseline to %s' % args.baseline)
+    elif failed:
+        print('Regressed by more than %.0f%%: %s' % (args.threshold * 100, ', '.join(failed)))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
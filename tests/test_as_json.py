@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+import json
+import unittest
+from base64 import urlsafe_b64encode
+
+from flask import Flask
+from flask_apputils.decorators import as_json
+from flask_apputils.helpers import Paginator
+from flask_apputils.routing import APIBlueprint
+
+
+class Author(object):
+    def to_json(self):
+        return dict(name='John', email='john@example.com')
+
+
+def post():
+    return dict(id=1, title='Title', author=Author())
+
+
+def users():
+    return Paginator(({'id': i} for i in range(5)), key='id', limit=2)
+
+
+def numbers():
+    return Paginator(list(range(5)), limit=2)
+
+
+class AsJsonTestCase(unittest.TestCase):
+    def setUp(self):
+        app = Flask(__name__)
+        app.add_url_rule('/post', 'post', as_json(post))
+        app.add_url_rule('/fields/post', 'fields_post', as_json(fields=True)(post))
+        app.add_url_rule('/users', 'users', as_json(users))
+        app.add_url_rule('/numbers', 'numbers', as_json(numbers))
+
+        api = APIBlueprint('api', __name__, url_prefix='/api', fields=True)
+        api.add_url_rule('/post', 'post', post)
+        api.add_url_rule('/all/post', 'all_post', post, fields=False)
+        app.register_blueprint(api)
+
+        self.client = app.test_client()
+
+    def get_json(self, url):
+        rv = self.client.get(url)
+        self.assertEqual(rv.status_code, 200)
+        return json.loads(rv.data.decode('utf-8'))
+
+    def test_fields_disabled(self):
+        data = self.get_json('/post?fields=id')
+        self.assertEqual(sorted(data), ['author', 'id', 'title'])
+        self.assertEqual(sorted(self.get_json('/api/all/post?fields=id')), ['author', 'id', 'title'])
+
+    def test_fields(self):
+        self.assertEqual(self.get_json('/fields/post?fields=id,author.name'), dict(id=1, author=dict(name='John')))
+        self.assertEqual(self.get_json('/api/post?fields=title'), dict(title='Title'))
+
+    def test_invalid_fields(self):
+        self.assertEqual(self.client.get('/fields/post?fields=author..name').status_code, 400)
+        self.assertEqual(self.client.get('/api/post?fields=id,').status_code, 400)
+
+    def test_keyset_pages(self):
+        ids = []
+        url = '/users'
+        while url:
+            rv = self.client.get(url)
+            data = json.loads(rv.data.decode('utf-8'))
+            ids.extend(item['id'] for item in data['result'])
+            url = data['next'] and '/users?cursor=' + data['next']
+            if url:
+                self.assertIn('cursor=', rv.headers['Link'])
+        self.assertEqual(ids, [0, 1, 2, 3, 4])
+
+    def test_offset_pages(self):
+        data = self.get_json('/numbers?offset=3')
+        self.assertEqual(data, dict(result=[3, 4], next=None))
+        data = self.get_json('/numbers?cursor=' + self.get_json('/numbers')['next'])
+        self.assertEqual(data['result'], [2, 3])
+
+    def test_invalid_cursor(self):
+        for cursor in ('["k", [1]]', '["k", null]', '["k", true]', '["x", 1]', 'not json'):
+            cursor = urlsafe_b64encode(cursor.encode('utf-8')).decode('ascii')
+            self.assertEqual(self.client.get('/users?cursor=' + cursor).status_code, 400)
+
+    def test_invalid_key(self):
+        paginator = Paginator([{'id': None}] * 3, key='id', limit=1)
+        self.assertRaises(ValueError, paginator.page, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+from flask import Flask, request, jsonify
+from werkzeug.datastructures import MultiDict
+from werkzeug.test import create_environ
+from flask_apputils.middlewares import CachedRequest, MethodRewriteMiddleware, MiddlewareStack, get_request_cache
+
+
+class MutableArgsRequest(CachedRequest):
+    parameter_storage_class = MultiDict
+
+
+def _middleware(name, log, process=False):
+    class Middleware(object):
+        def __init__(self, app):
+            self.app = app
+
+        def __call__(self, environ, start_response):
+            log.append(name)
+            return self.app(environ, start_response)
+
+    if process:
+        Middleware.process_request = lambda self, environ, cache: log.append(name)
+    return Middleware
+
+
+class MiddlewaresTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.request_class = CachedRequest
+        self.app.wsgi_app = MiddlewareStack(self.app.wsgi_app, [MethodRewriteMiddleware])
+
+        @self.app.route('/', methods=['GET', 'POST', 'PUT', 'DELETE'])
+        def index():
+            return jsonify(method=request.method, args=request.args.to_dict(), cookies=dict(request.cookies),
+                           shared=request.args is get_request_cache(request.environ).args(request.environ, request))
+
+        self.client = self.app.test_client()
+
+    def test_method_header(self):
+        rv = self.client.post('/', headers=[('X-HTTP-Method-Override', 'put')])
+        self.assertIn(b'"PUT"', rv.data)
+
+    def test_method_query(self):
+        rv = self.client.post('/?_method=delete&page=2')
+        self.assertIn(b'"DELETE"', rv.data)
+        self.assertIn(b'"shared": true', rv.data)
+
+    def test_method_not_rewritten(self):
+        self.assertIn(b'"GET"', self.client.get('/?_method=delete').data)
+        self.assertIn(b'"POST"', self.client.post('/?_method=get').data)
+        self.assertIn(b'"POST"', self.client.post('/?x_method_').data)
+
+    def test_request_settings(self):
+        environ = create_environ('/?a=1')
+        args = get_request_cache(environ).args(environ)
+        custom = MutableArgsRequest(environ).args
+        self.assertIs(type(custom), MultiDict)
+        self.assertIsNot(custom, args)
+        self.assertIs(CachedRequest(environ).args, args)
+
+    def test_order(self):
+        log = []
+        stack = MiddlewareStack(lambda environ, start_response: log.append('app'), [
+            _middleware('p1', log, True), _middleware('w1', log), _middleware('p2', log, True),
+            _middleware('p3', log, True), _middleware('w2', log)
+        ])
+        stack(create_environ('/'), None)
+        self.assertEqual(log, ['p1', 'w1', 'p2', 'p3', 'w2', 'app'])
+
+
+if __name__ == '__main__':
+    unittest.main()
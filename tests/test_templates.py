@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from flask import Flask
+from flask_apputils.routing import TemplateBlueprint
+
+TEMPLATES = {
+    'web/index.html': '{% extends "web/layout.html" %}{% block body %}{% include "web/partials/item.html" %}{% endblock %}',
+    'web/layout.html': '<body>{% block body %}{% endblock %}</body>',
+    'web/partials/item.html': '{% cache "item", 60 %}{{ name }}{% endcache %}',
+    'other.html': 'other'
+}
+
+
+def index():
+    return dict(name='John')
+
+
+class TemplateBlueprintTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for name, source in TEMPLATES.items():
+            path = os.path.join(self.folder, *name.split('/'))
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write(source)
+
+        self.web = TemplateBlueprint('web', __name__)
+        self.web.add_url_rule('/', 'index', index)
+        self.app = Flask(__name__, template_folder=self.folder)
+        self.app.jinja_options = dict(Flask.jinja_options, cache_size=2)
+        self.app.config['TEMPLATE_FRAGMENT_CACHE'] = True
+        self.app.register_blueprint(self.web)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def cached(self):
+        return sorted(key[1] for key in self.app.jinja_env.cache.keys())
+
+    def test_init_app(self):
+        self.web.init_app(self.app)
+        self.assertEqual(self.cached(), ['web/index.html', 'web/layout.html', 'web/partials/item.html'])
+        self.assertEqual(self.app.test_client().get('/').data, b'<body>John</body>')
+
+    def test_precompile_disabled(self):
+        self.app.config['TEMPLATE_PRECOMPILE'] = False
+        self.web.init_app(self.app)
+        self.assertEqual(self.cached(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+import hashlib
+import unittest
+from io import BytesIO
+
+from flask import Flask, request, jsonify
+from flask_apputils.decorators import with_uploads
+from flask_apputils.routing import APIBlueprint
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 64
+GIF = b'GIF89a' + b'\x00' * 64
+
+
+def _not_wrapped(f):
+    def wrapper(*args, **kwargs):
+        return f(*args, **kwargs)
+    return wrapper
+
+
+def upload(**kwargs):
+    return dict(files=[f.filename for f in request.files.getlist('file')],
+                hashes=[getattr(f, 'hash', None) for f in request.files.getlist('file')],
+                form=kwargs)
+
+
+class UploadsTestCase(unittest.TestCase):
+    def setUp(self):
+        app = Flask(__name__)
+
+        @app.route('/upload', methods=['POST'])
+        @with_uploads(extensions=['png', 'gif'], max_size=1024, hash_name='sha256')
+        def view():
+            return jsonify(files=[f.filename for f in request.files.getlist('file')],
+                           hashes=[getattr(f, 'hash', None) for f in request.files.getlist('file')])
+
+        api = APIBlueprint('api', __name__, url_prefix='/api')
+        api.add_url_rule('/stream', 'stream', upload, methods=['POST'],
+                         uploads=dict(extensions=['png'], hash_name='sha256'))
+        # the form is loaded by `with_request_body` before `with_uploads` runs
+        api.add_url_rule('/parsed', 'parsed', _not_wrapped(with_uploads(extensions=['png'])(upload)),
+                         methods=['POST'])
+        app.register_blueprint(api)
+
+        self.client = app.test_client()
+
+    def post(self, url, files, **data):
+        data['file'] = [(BytesIO(content), filename, content_type) for content, filename, content_type in files]
+        return self.client.post(url, data=data, content_type='multipart/form-data')
+
+    def test_hash(self):
+        rv = self.post('/upload', [(PNG, 'a.png', 'image/png'), (GIF, 'b.gif', 'image/gif')])
+        self.assertEqual(rv.status_code, 200)
+        self.assertIn(b'a.png', rv.data)
+        self.assertIn(hashlib.sha256(PNG).hexdigest().encode('ascii'), rv.data)
+        self.assertIn(hashlib.sha256(GIF).hexdigest().encode('ascii'), rv.data)
+
+    def test_octet_stream(self):
+        rv = self.post('/upload', [(PNG, 'a.png', 'application/octet-stream')])
+        self.assertEqual(rv.status_code, 200)
+
+    def test_empty_file_input(self):
+        rv = self.post('/upload', [(b'', '', 'application/octet-stream')])
+        self.assertEqual(rv.status_code, 200)
+
+    def test_too_large(self):
+        rv = self.post('/upload', [(PNG + b'\x00' * 2048, 'a.png', 'image/png')])
+        self.assertEqual(rv.status_code, 413)
+
+    def test_extension(self):
+        rv = self.post('/upload', [(b'MZ' + b'\x00' * 16, 'a.exe', 'application/octet-stream')])
+        self.assertEqual(rv.status_code, 415)
+
+    def test_content_type(self):
+        rv = self.post('/upload', [(PNG, 'a.png', 'application/pdf')])
+        self.assertEqual(rv.status_code, 415)
+
+    def test_magic(self):
+        rv = self.post('/upload', [(GIF, 'a.png', 'image/png')])
+        self.assertEqual(rv.status_code, 415)
+
+    def test_api_blueprint(self):
+        rv = self.post('/api/stream', [(PNG, 'a.png', 'image/png')], name='avatar')
+        self.assertEqual(rv.status_code, 200)
+        self.assertIn(b'avatar', rv.data)
+        self.assertIn(hashlib.sha256(PNG).hexdigest().encode('ascii'), rv.data)
+        self.assertEqual(self.post('/api/stream', [(GIF, 'a.png', 'image/png')]).status_code, 415)
+
+    def test_form_already_loaded(self):
+        self.assertEqual(self.post('/api/parsed', [(PNG, 'a.png', 'image/png')]).status_code, 200)
+        self.assertEqual(self.post('/api/parsed', [(GIF, 'a.png', 'image/png')]).status_code, 415)
+
+
+if __name__ == '__main__':
+    unittest.main()